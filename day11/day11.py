@@ -1,102 +1,127 @@
+import sys
+import time
 from collections import namedtuple
+from multiprocessing import Pool
 
-import numpy as np
-
-from computer import Computer
+from computer import Computer, CowMemory, SharedProgram, get_engine, load_tape
+from hull import Hull, STRIDE, pack, unpack
 
 Point = namedtuple('Point', ['x', 'y'])
 
 BLACK = '.'
 WHITE = '#'
+# Chars for each colour bit, for rendering the hull
+CHARS = (BLACK, WHITE)
+
+class Simulation(namedtuple('Simulation', ['steps', 'seconds', 'halted'])):
+    @property
+    def steps_per_second(self):
+        return self.steps / self.seconds if self.seconds else 0.0
+
+# Changes to a packed location moving up, right, down and left
+MOVES = (STRIDE, 1, -STRIDE, -1)
+# Changes to the direction for turning left and right
+TURNS = (-1, 1)
 
 class Robot:
     def __init__(self,
                  brain,
-                 grid,
+                 hull,
                  location,
                  direction,
-                 painted=set()):
+                 painted=None):
         self.brain = brain
-        self.grid = grid
-        self.location = location
+        self.hull = hull
+        # Packed, as pack(x, y), and likewise the locations in `painted`
+        self.location = pack(*location)
         self.direction = direction
-        self.painted = painted
-
-        self.rotater = {
-            0 : lambda x: (x - 1) % 4,
-            1 : lambda x: (x + 1) % 4,
-        }
-
-        self.mover = {
-            0 : lambda p: Point(p.x, p.y + 1),
-            1 : lambda p: Point(p.x + 1, p.y),
-            2 : lambda p: Point(p.x, p.y - 1),
-            3 : lambda p: Point(p.x - 1, p.y),
-        }
-
-        self.color_map = {
-            0 : BLACK,
-            BLACK : 0,
-            1 : WHITE,
-            WHITE : 1,
-        }
-
-    def getter(self, point):
-        return self.grid[point.y][point.x]
-
-    def setter(self, point, char):
-        self.grid[point.y][point.x] = char
-    
+        self.painted = set() if painted is None else painted
+
+    @property
+    def position(self):
+        return Point(*unpack(self.location))
+
     @property
     def current_color(self):
-        return self.getter(self.location)
+        return self.hull.get_at(self.location)
+
+    @property
+    def painted_count(self):
+        return len(self.painted)
 
     def move(self):
-        mover_function = self.mover[self.direction]
-        self.location = mover_function(self.location)
+        self.location += MOVES[self.direction]
 
-    def rotate(self, direction):
-        rotater_function = self.rotater[direction]
-        self.direction = rotater_function(self.direction)
+    def rotate(self, turn):
+        self.direction = (self.direction + TURNS[turn]) % 4
 
     def paint(self, color):
-        self.setter(self.location, self.color_map[color])
-        if self.location not in self.painted:
-            self.painted.add(self.location)
-
-    def print_grid(self):
-        for i in range(len(self.grid)-1, -1, -1):
-            for j in range(len(self.grid[0])):
-                print(self.grid[i][j], end=" ")
-            print("")
-
-    def run(self):
+        self.hull.set_at(self.location, color)
+        self.painted.add(self.location)
+
+    # The GRID_DIMS window the hull used to be, or with `cropped` just the
+    # cells painted, written out in one go
+    def print_grid(self, cropped=False):
+        grid_width, grid_height = GRID_DIMS
+        bounds = None if cropped else (0, 0, grid_width, grid_height)
+        sys.stdout.write(self.hull.render(CHARS, bounds))
+
+    # With a `renderer` (a HullRenderer), draw a frame after every move
+    def run(self, renderer=None):
         while not self.brain.halted:
-            in_val = self.color_map[self.current_color]
-            out1 = self.brain.run(output_mode=True, extra_in_vals=[in_val])
-            self.paint(out1)
-            out2 = self.brain.run(output_mode=True)
-            self.rotate(out2)
-            self.move()
+            outs = self.brain.run_until_input(extra_in_vals=[self.current_color])
+            for color, turn in zip(outs[::2], outs[1::2]):
+                self.paint(color)
+                self.rotate(turn)
+                self.move()
+            if renderer:
+                renderer.draw()
         return self.painted
 
+    # Coroutine taking the brain's outputs as they are given, a colour
+    # then a turn for every step, and finishing after `max_steps` steps
+    def controller(self, max_steps=None):
+        hull = self.hull
+        painted = self.painted
+        steps = 0
+        while steps != max_steps:
+            color = yield
+            turn = yield
+            hull.set_at(self.location, color)
+            painted.add(self.location)
+            self.direction = direction = (self.direction + TURNS[turn]) % 4
+            self.location += MOVES[direction]
+            steps += 1
+            self.steps = steps
+
+    def simulate(self, max_steps=None):
+        """Run headless, with the brain wired straight to the controller:
+        it reads the colour under the robot and hands over its outputs
+        without returning between steps, so nearly all the time goes on
+        the brain itself. Stops when the brain halts or after `max_steps`
+        steps. Returns a Simulation"""
+        controller = self.controller(max_steps)
+        self.steps = 0
+        start = time.perf_counter()
+        try:
+            # With no steps to take, this finishes the controller at once
+            next(controller)
+            self.brain.run_io(lambda: self.hull.get_at(self.location), controller.send)
+        except StopIteration:
+            pass
+        return Simulation(self.steps, time.perf_counter() - start, self.brain.halted)
 
 
-EXTRA_MEMORY = 10000
-MEMORY_INIT_VALUE = 0
-
 GRID_DIMS = 100, 100
 ROBOT_START = Point(50, 50)
 
 def get_input(input_path):
-    with open(input_path) as f:
-        line = f.readline()
-
-    return list(map(int, line.split(',')))
+    return load_tape(input_path)
 
 
-def get_robot(tape, grid):
-    brain = Computer(
+def get_robot(tape, hull, location=ROBOT_START, direction=0, engine=None):
+    engine = get_engine(engine) if engine else Computer
+    brain = engine(
         tape=tape,
         ptr=0,
         in_vals=[],
@@ -105,48 +130,85 @@ def get_robot(tape, grid):
 
     robot = Robot(
         brain=brain,
-        grid=grid,
-        location=ROBOT_START,
-        direction=0,
+        hull=hull,
+        location=location,
+        direction=direction,
         painted=set()
     )
 
     return robot
 
 
-def main():
-    tape = get_input('input.txt')
-    extra_memory = [MEMORY_INIT_VALUE]*EXTRA_MEMORY
-    tape += extra_memory
+# One robot to run: the hull's colour, the colour of the panel it starts
+# on (None for the hull's), where it starts and which way it faces, cells
+# of the brain program to change first as (address, value) pairs, and
+# the Intcode engine for the brain (None for the default)
+RobotRun = namedtuple(
+    'RobotRun',
+    ['background', 'start_color', 'location', 'direction', 'patches', 'engine'],
+    defaults=(0, None, ROBOT_START, 0, (), None),
+)
 
-    brain = Computer(
-        tape=tape,
-        ptr=0,
-        in_vals=[],
-        base=0,
-    )
+# What a run painted: how many panels, the painted area rendered, and the
+# steps the robot took
+RobotResult = namedtuple('RobotResult', ['run', 'painted', 'image', 'steps'])
+
+
+def run_robot(tape, run):
+    for address, value in run.patches:
+        tape[address] = value
 
-    grid_width, grid_height = GRID_DIMS
+    hull = Hull(background=run.background)
+    if run.start_color is not None:
+        hull.set(run.location.x, run.location.y, run.start_color)
 
-    grid_1 = np.zeros((grid_height, grid_width), 'U1')
-    grid_1.fill(WHITE)
+    robot = get_robot(tape, hull, run.location, run.direction, run.engine)
+    simulation = robot.simulate()
+    return RobotResult(run, robot.painted_count, hull.render(CHARS), simulation.steps)
 
-    robot_1 = get_robot(tape, grid_1)
-    painted_1 = robot_1.run()
 
-    print('Answer to part 1: {}'.format(len(painted_1)))
+# Program for the worker processes, sent once per worker. A SharedProgram
+# arrives as just the name of its segment, and every run gets its own
+# copy-on-write view of its cells
+worker_program = None
 
-    grid_2 = np.zeros((grid_height, grid_width), 'U1')
-    grid_2.fill(BLACK)
-    grid_2[ROBOT_START.y][ROBOT_START.x] = WHITE
+def init_worker(program):
+    global worker_program
+    worker_program = program
 
-    robot_2 = get_robot(tape, grid_2)
-    painted_2 = robot_2.run()
 
-    robot_2.print_grid()
+def run_robot_worker(run):
+    if isinstance(worker_program, SharedProgram):
+        tape = worker_program.memory()
+    else:
+        tape = CowMemory(worker_program)
+    return run_robot(tape, run)
+
+
+def run_robots(program, runs, processes=None):
+    """Run every RobotRun in `runs` across a process pool, each on its own
+    copy-on-write view of `program` (a SharedProgram, or a tuple of cells
+    for every worker to be sent a copy of), and get a RobotResult for
+    each, in order"""
+    with Pool(processes, initializer=init_worker, initargs=(program,)) as pool:
+        return pool.map(run_robot_worker, runs)
+
+
+def main():
+    program = SharedProgram(get_input('input.txt'))
+    runs = [
+        RobotRun(background=1),
+        RobotRun(background=0, start_color=1),
+    ]
+
+    try:
+        result_1, result_2 = run_robots(program, runs)
+    finally:
+        program.unlink()
 
-main()
-    
+    print('Answer to part 1: {}'.format(result_1.painted))
+    sys.stdout.write(result_2.image)
 
 
-    
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import sys
+from functools import lru_cache
+
+TILE_BITS = 3
+TILE_SIZE = 1 << TILE_BITS
+TILE_MASK = TILE_SIZE - 1
+
+ROW_MASK = (1 << TILE_SIZE) - 1
+
+# Coordinates are packed into one int, y * STRIDE + x, which works for
+# any x in [-BIAS, BIAS) and any y
+STRIDE = 1 << 32
+BIAS = STRIDE >> 1
+X_MASK = STRIDE - 1
+
+
+def pack(x, y):
+    return y * STRIDE + x
+
+
+def unpack(key):
+    key += BIAS
+    return (key & X_MASK) - BIAS, key >> 32
+
+
+class Hull:
+    """The hull's panels as colour bits (0 black, 1 white), in square
+    tiles of TILE_SIZE x TILE_SIZE cells, keyed by their packed tile
+    coordinates, that are only created the first time a cell in them is
+    painted. Each tile is a bytearray with one byte per row, so the hull
+    can grow in any direction, negative coordinates included, and costs
+    memory only for the area actually painted.
+    Unpainted cells are `background`.
+    """
+    def __init__(self, background=0):
+        self.background = background
+        self.tiles = {}
+        # [x_min, y_min, x_max, y_max] of every cell painted, maxes
+        # exclusive, or None before the first
+        self.extent = None
+        # Rows painted since a renderer last drew the hull
+        self.dirty = set()
+
+    def get(self, x, y):
+        tile = self.tiles.get(pack(x >> TILE_BITS, y >> TILE_BITS))
+        if tile is None:
+            return self.background
+        return tile[y & TILE_MASK] >> (x & TILE_MASK) & 1
+
+    def set(self, x, y, colour):
+        self.dirty.add(y)
+        extent = self.extent
+        if extent is None:
+            self.extent = [x, y, x + 1, y + 1]
+        else:
+            if x < extent[0]:
+                extent[0] = x
+            elif x >= extent[2]:
+                extent[2] = x + 1
+            if y < extent[1]:
+                extent[1] = y
+            elif y >= extent[3]:
+                extent[3] = y + 1
+
+        key = pack(x >> TILE_BITS, y >> TILE_BITS)
+        tile = self.tiles.get(key)
+        if tile is None:
+            if colour == self.background:
+                return
+            fill = ROW_MASK if self.background else 0
+            tile = self.tiles[key] = bytearray([fill] * TILE_SIZE)
+
+        bit = 1 << (x & TILE_MASK)
+        if colour:
+            tile[y & TILE_MASK] |= bit
+        else:
+            tile[y & TILE_MASK] &= ROW_MASK ^ bit
+
+    # get and set for a packed location
+    def get_at(self, key):
+        key += BIAS
+        return self.get((key & X_MASK) - BIAS, key >> 32)
+
+    def set_at(self, key, colour):
+        key += BIAS
+        self.set((key & X_MASK) - BIAS, key >> 32, colour)
+
+    # (x_min, y_min, x_max, y_max) of the cells painted so far, with the
+    # maxes exclusive, or None if there are none
+    def painted_bounds(self):
+        return None if self.extent is None else tuple(self.extent)
+
+    # Row `y` from `x_min` up to `x_max` as a string of `chars`, one per
+    # colour, going through whole tile rows at a time
+    def row(self, y, x_min, x_max, chars):
+        table = row_table(chars)
+        ty = y >> TILE_BITS
+        ix = y & TILE_MASK
+        empty = table[ROW_MASK if self.background else 0]
+        tiles = self.tiles
+        pieces = []
+        for tx in range(x_min >> TILE_BITS, ((x_max - 1) >> TILE_BITS) + 1):
+            tile = tiles.get(pack(tx, ty))
+            pieces.append(empty if tile is None else table[tile[ix]])
+        start = x_min & TILE_MASK
+        return ''.join(pieces)[start:start + x_max - x_min]
+
+    # The hull within `bounds` (the painted cells by default) as text, top
+    # row first and each cell followed by a space, as print_grid has it
+    def render(self, chars, bounds=None):
+        return ''.join(line + '\n' for line in self.lines(chars, bounds))
+
+    def lines(self, chars, bounds=None):
+        bounds = bounds or self.painted_bounds()
+        if bounds is None:
+            return []
+        x_min, y_min, x_max, y_max = bounds
+        return [
+            self.line(y, x_min, x_max, chars)
+            for y in range(y_max - 1, y_min - 1, -1)
+        ]
+
+    def line(self, y, x_min, x_max, chars):
+        return ' '.join(self.row(y, x_min, x_max, chars)) + ' '
+
+
+# Every byte of a tile row spelled out in `chars`, lowest bit first
+@lru_cache(maxsize=None)
+def row_table(chars):
+    return [
+        ''.join(chars[byte >> bit & 1] for bit in range(TILE_SIZE))
+        for byte in range(1 << TILE_SIZE)
+    ]
+
+
+class HullRenderer:
+    """Draws a hull to `out` a frame at a time, building each frame in one
+    string and writing it in one call.
+
+    Frames are cropped to the painted cells unless `bounds` is given. With
+    `incremental`, the frame is drawn once and after that only the rows
+    painted since the last frame are redrawn in place, moving the cursor
+    with ANSI escapes, so watching a long run costs little more than the
+    cells that change. Only one renderer should draw a given hull, as it
+    takes the hull's record of which rows those were.
+    """
+    def __init__(self, hull, chars, out=None, incremental=False, bounds=None):
+        self.hull = hull
+        self.chars = chars
+        self.out = out or sys.stdout
+        self.incremental = incremental
+        self.bounds = bounds
+        # Bounds and lines of the last frame drawn
+        self.drawn_bounds = None
+        self.drawn = []
+
+    def draw(self):
+        hull = self.hull
+        bounds = self.bounds or hull.painted_bounds()
+        if bounds is None:
+            return
+        if not self.incremental:
+            hull.dirty.clear()
+            self.out.write(hull.render(self.chars, bounds))
+        elif bounds != self.drawn_bounds:
+            # The frame has grown, so start again from a clear screen
+            hull.dirty.clear()
+            self.drawn_bounds = bounds
+            self.drawn = hull.lines(self.chars, bounds)
+            self.out.write('\x1b[H\x1b[2J' + ''.join(line + '\n' for line in self.drawn))
+        else:
+            self.out.write(self.redraw(bounds))
+        self.out.flush()
+
+    # Escapes and text redrawing the rows painted since the last frame
+    def redraw(self, bounds):
+        x_min, y_min, x_max, y_max = bounds
+        buffer = []
+        for y in sorted(self.hull.dirty):
+            if not y_min <= y < y_max:
+                continue
+            line = self.hull.line(y, x_min, x_max, self.chars)
+            screen_row = y_max - 1 - y
+            if line != self.drawn[screen_row]:
+                self.drawn[screen_row] = line
+                buffer.append('\x1b[{};1H{}'.format(screen_row + 1, line))
+        self.hull.dirty.clear()
+        if buffer:
+            # Leave the cursor under the frame
+            buffer.append('\x1b[{};1H'.format(len(self.drawn) + 1))
+        return ''.join(buffer)
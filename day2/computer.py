@@ -0,0 +1,11 @@
+# The Intcode computer lives in the shared intcode package at the repo
+# root. This keeps `from computer import Computer` working from this day,
+# with the engine picked by the INTCODE_ENGINE environment variable
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from intcode import *
+
+Computer = get_engine()
@@ -1,32 +1,120 @@
+from itertools import product
+from multiprocessing import Pool
+
 import numpy as np
 
+from computer import BatchComputer
+
+TARGET = 19690720
+CHUNK_SIZE = 500
+BATCH_SIZE = 2500
+
 op_dict = {
     1: lambda x, y: x + y,
     2: lambda x, y: x * y,
 }
 
 class Tape:
-    def __init__(self, tape):
+    # `tape` is the program image, never written and shared by every
+    # clone; `writes` holds only the cells this tape has changed
+    def __init__(self, tape, writes=None):
         self.tape = tape
+        self.writes = {} if writes is None else writes
 
     def ix_lookup(self, ix):
+        if ix in self.writes:
+            return self.writes[ix]
         return self.tape[ix]
 
     def ix_assign(self, ix, val):
-        self.tape[ix] = val
+        self.writes[ix] = val
 
     def full_lookup(self, ix):
-        return self.tape[self.tape[ix]]
+        return self.ix_lookup(self.ix_lookup(ix))
     
     def full_assign(self, ix, val):
-        self.tape[self.tape[ix]] = val
+        self.ix_assign(self.ix_lookup(ix), val)
 
     def apply_op(self, op, ix_1, ix_2, ix_3):
         val = op(self.full_lookup(ix_1), self.full_lookup(ix_2))
         self.full_assign(ix_3, val)
 
     def get_full_tape(self):
-        return self.tape
+        return [self.ix_lookup(ix) for ix in range(len(self.tape))]
+
+    # Copy-on-write clone, sharing the image and copying only the writes
+    def clone(self):
+        return Tape(self.tape, self.writes.copy())
+
+# A value that depends on noun and verb in a way we don't track, e.g. read
+# from an address given by the noun. Fine as long as nothing uses it
+class Unknown:
+    def __add__(self, other):
+        return self
+
+    __radd__ = __mul__ = __rmul__ = __add__
+
+UNKNOWN = Unknown()
+
+
+# const + noun_coeff * noun + verb_coeff * verb
+class Linear:
+    def __init__(self, const, noun_coeff, verb_coeff):
+        self.const = const
+        self.noun_coeff = noun_coeff
+        self.verb_coeff = verb_coeff
+
+    @property
+    def is_const(self):
+        return self.noun_coeff == 0 and self.verb_coeff == 0
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            other = Linear(other, 0, 0)
+        if not isinstance(other, Linear):
+            return NotImplemented
+        return Linear(
+            self.const + other.const,
+            self.noun_coeff + other.noun_coeff,
+            self.verb_coeff + other.verb_coeff,
+        )
+
+    def __mul__(self, other):
+        if isinstance(other, int):
+            other = Linear(other, 0, 0)
+        if not isinstance(other, Linear):
+            return NotImplemented
+        if not self.is_const and not other.is_const:
+            return UNKNOWN
+        scale, linear = (self, other) if self.is_const else (other, self)
+        return Linear(
+            scale.const * linear.const,
+            scale.const * linear.noun_coeff,
+            scale.const * linear.verb_coeff,
+        )
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+NOUN = Linear(0, 1, 0)
+VERB = Linear(0, 0, 1)
+
+
+class SymbolicTape(Tape):
+    # Reading through a symbolic address could give any cell
+    def full_lookup(self, ix):
+        address = self.ix_lookup(ix)
+        if not isinstance(address, int):
+            return UNKNOWN
+        return self.ix_lookup(address)
+
+    # Writing through one could clobber any cell, so give up
+    def full_assign(self, ix, val):
+        address = self.ix_lookup(ix)
+        if not isinstance(address, int):
+            raise ValueError('Write to symbolic address at {}'.format(ix))
+        self.ix_assign(address, val)
+
 
 def perform_op(tape, op_ix):
     op = op_dict[tape.ix_lookup(op_ix)]
@@ -51,6 +139,92 @@ def run_computer(tape, configure=None):
         ix += 4
 
     return tape.ix_lookup(0)
+
+
+# Run the program once with noun and verb left as unknowns, and solve the
+# linear output for them. Raises ValueError if the output isn't linear
+def solve_symbolic(tape, target, nouns, verbs):
+    memory = SymbolicTape(tape.tape, tape.writes.copy())
+    try:
+        out = run_computer(memory, configure=(NOUN, VERB))
+    except KeyError:
+        raise ValueError('Symbolic opcode in program')
+    if isinstance(out, int):
+        out = Linear(out, 0, 0)
+    if not isinstance(out, Linear):
+        raise ValueError('Output does not depend linearly on noun and verb')
+
+    for noun in nouns:
+        rest = target - out.const - out.noun_coeff * noun
+        if out.verb_coeff == 0:
+            if rest == 0 and verbs:
+                return noun, verbs[0]
+        elif rest % out.verb_coeff == 0 and rest // out.verb_coeff in verbs:
+            return noun, rest // out.verb_coeff
+    return None
+
+
+# Program and target for the worker processes, sent once per worker
+worker_tape = None
+worker_target = None
+
+def init_worker(tape, target):
+    global worker_tape, worker_target
+    worker_tape = tape
+    worker_target = target
+
+
+def search_chunk(configs):
+    for config in configs:
+        if run_computer(worker_tape.clone(), configure=config) == worker_target:
+            return config
+    return None
+
+
+# Run candidates BATCH_SIZE at a time, each batch in lockstep on one
+# BatchComputer. The program never grows, so the tapes needn't either
+def search_batched(tape, target, configs):
+    program = tape.get_full_tape()
+    for i in range(0, len(configs), BATCH_SIZE):
+        batch_configs = configs[i:i + BATCH_SIZE]
+        tapes = []
+        for noun, verb in batch_configs:
+            patched = program[:]
+            patched[1], patched[2] = noun, verb
+            tapes.append(patched)
+        batch = BatchComputer(tapes, width=len(program))
+        batch.run()
+        for config, out in zip(batch_configs, batch.cells(0)):
+            if out == target:
+                return config
+    return None
+
+
+def search(tape, target, nouns=range(100), verbs=range(100),
+           symbolic=False, processes=None, batched=False):
+    """Find the (noun, verb) for which the program outputs `target`, or
+    None. Candidates are tried in chunks over a process pool, and the pool
+    is torn down as soon as one chunk finds a match. With `symbolic`, try
+    solving for them directly first. With `batched`, run them in lockstep
+    batches in this process instead of over the pool.
+    """
+    if symbolic:
+        try:
+            return solve_symbolic(tape, target, nouns, verbs)
+        except ValueError:
+            pass
+
+    configs = list(product(nouns, verbs))
+    if batched:
+        return search_batched(tape, target, configs)
+    chunks = [
+        configs[i:i + CHUNK_SIZE] for i in range(0, len(configs), CHUNK_SIZE)
+    ]
+    with Pool(processes, initializer=init_worker, initargs=(tape, target)) as pool:
+        for match in pool.imap_unordered(search_chunk, chunks):
+            if match:
+                return match
+    return None
     
     
 def part_1():
@@ -60,15 +234,13 @@ def part_1():
 
 def part_2():
     tape = get_tape()
-    tape_contents = tape.get_full_tape()
-    for noun in range(100):
-        for verb in range(100):
-            memory = Tape(tape_contents.copy())
-            out = run_computer(memory, configure=(noun, verb))
-            if out == 19690720:
-                print('Answer to part 2: {}'.format(100 * noun + verb))
-                return
+    match = search(tape, TARGET, symbolic=True)
+    if match:
+        noun, verb = match
+        print('Answer to part 2: {}'.format(100 * noun + verb))
+        return
     print('target not found')
 
-part_1()
-part_2()
+if __name__ == '__main__':
+    part_1()
+    part_2()
@@ -1,43 +1,90 @@
-from computer import Computer
+from collections import OrderedDict
+from computer import Computer, CowMemory, SharedProgram, load_tape
+from functools import partial
 from itertools import cycle, permutations
+from multiprocessing import Pool
 
 AMPLIFIERS = ['A', 'B', 'C', 'D', 'E']
 
 INPUT_VALUE = 0
 
+CACHE_SIZE = 4096
+
 def get_input(input_path):
-    with open(input_path) as f:
-        line = f.readline()
+    return load_tape(input_path)
+
+
+# Program image shared by every amplifier, each only keeping its writes
+def get_program(input_path):
+    return CowMemory(tuple(get_input(input_path)))
+
+
+class AmplifierCache:
+    """Bounded LRU cache of single amplifier runs. An amplifier is a pure
+    function of its program, phase and input, so results are keyed on a
+    fingerprint of the program along with those two"""
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, tape, phase, in_val):
+        key = (tape.fingerprint(), phase, in_val)
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        self.misses += 1
+        computer = Computer(tape=tape.clone(), ptr=0, in_vals=[phase, in_val])
+        out = computer.run(output_mode=False)
+        self.results[key] = out
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+        return out
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        return 'hits: {}, misses: {}, hit rate: {:.1%}'.format(
+            self.hits, self.misses, self.hit_rate
+        )
+
+amplifier_cache = AmplifierCache()
 
-    return list(map(int, line.split(',')))
+
+def run_amplifier(tape, phase, in_val):
+    """Run a single amplifier and get its output"""
+    return amplifier_cache.run(tape, phase, in_val)
 
 
 def run_amplifiers(tape, phases):
     """Part 1: Run all amplifiers once and get the output"""
     in_val = INPUT_VALUE
     for phase in phases:
-        computer = Computer(tape=tape, ptr=0, in_vals=[phase, in_val])
-        out = computer.run(output_mode=False)
-        in_val = out
-    return computer.out
+        in_val = run_amplifier(tape, phase, in_val)
+    return in_val
 
 
 def run_amplifier_circuit(tape, phases):
     """Part 2: Run amplifiers in a circuit until they have halted"""
     amplifiers = {
-        amp : Computer(tape=tape.copy(), ptr=0, in_vals=[phase])
+        amp : Computer(tape=tape.clone(), ptr=0, in_vals=[phase])
         for amp, phase in zip(AMPLIFIERS, phases)
     }
 
     # Generator that loops around the amplifiers
     amp_gen = cycle(AMPLIFIERS)
     which_amp = next(amp_gen)
-    in_val = INPUT_VALUE
+    signals = [INPUT_VALUE]
     while not amplifiers['E'].halted:
         amp = amplifiers[which_amp]
-        amp.add_in_val(in_val)
-        out = amp.run(output_mode=True)
-        in_val = out
+        # Pass on everything the amplifier gives before it needs more input
+        signals = amp.run_until_input(extra_in_vals=signals)
         which_amp = next(amp_gen)
 
     return amplifiers['E'].out
@@ -49,19 +96,78 @@ def optimize(tape, perms, run_func):
     return max(outputs)
 
 
+def best_chain(tape, phases, in_val=INPUT_VALUE):
+    """Part 1: Find the max output over every order of `phases`, running
+    the amplifiers for each shared prefix of phases only once"""
+    if not phases:
+        return in_val
+    return max(
+        best_chain(
+            tape,
+            [other for other in phases if other != phase],
+            run_amplifier(tape, phase, in_val),
+        )
+        for phase in phases
+    )
+
+
+# Program for the worker processes, sent once per worker. A SharedProgram
+# arrives as just the name of its segment, and workers run on its cells
+# in place instead of each holding a copy
+worker_program = None
+worker_tape = None
+
+def init_worker(program):
+    global worker_program, worker_tape
+    worker_program = program
+    if isinstance(program, SharedProgram):
+        worker_tape = program.memory()
+    else:
+        worker_tape = program
+
+
+def score_worker(run_func, phases):
+    return run_func(worker_tape, phases)
+
+
+def best_chain_worker(phases, first_phase):
+    rest = [phase for phase in phases if phase != first_phase]
+    in_val = run_amplifier(worker_tape, first_phase, INPUT_VALUE)
+    return best_chain(worker_tape, rest, in_val)
+
+
+def parallel_optimize(tape, perms, run_func, processes=None):
+    """Find the max output given a list of permutations, scoring them
+    across a process pool"""
+    with Pool(processes, initializer=init_worker, initargs=(tape,)) as pool:
+        scores = pool.imap_unordered(
+            partial(score_worker, run_func), perms, chunksize=8
+        )
+        return max(scores)
+
+
+def parallel_best_chain(tape, phases, processes=None):
+    """Part 1: best_chain, with the subtree under each first phase
+    searched in its own process"""
+    with Pool(processes, initializer=init_worker, initargs=(tape,)) as pool:
+        return max(pool.imap_unordered(partial(best_chain_worker, phases), phases))
+
+
 
 def main():
-    tape = get_input('input.txt')
+    program = SharedProgram(get_input('input.txt'))
 
-    part_1_perms = permutations([0, 1, 2, 3, 4])
     part_2_perms = permutations([5, 6, 7, 8, 9])
 
-    part_1 = optimize(tape, part_1_perms, run_amplifiers)
-    part_2 = optimize(tape, part_2_perms, run_amplifier_circuit)
+    try:
+        part_1 = parallel_best_chain(program, [0, 1, 2, 3, 4])
+        part_2 = parallel_optimize(program, part_2_perms, run_amplifier_circuit)
+    finally:
+        program.unlink()
 
     print('Answer to part 1: {}'.format(part_1))
     print('Answer to part 2: {}'.format(part_2))
 
 
-
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
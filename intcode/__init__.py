@@ -0,0 +1,76 @@
+"""Intcode computer shared by every day that runs Intcode programs.
+
+`Computer` is the plain interpreter. The other engines are drop-in
+subclasses: `CompiledComputer` compiles basic blocks to Python,
+`AsyncComputer` reads and writes through asyncio queues,
+`ProfiledComputer` counts where a program spends its steps, and
+`TracedComputer` records a run so any point in it can be replayed.
+`BatchComputer` is separate, running many machines in lockstep.
+`get_engine` picks one by name, defaulting to the INTCODE_ENGINE
+environment variable, which is how the day scripts choose theirs.
+"""
+import os
+
+from .batch import BatchComputer
+from .channels import AsyncComputer, connect, connect_loop, run_network
+from .compiler import CompiledComputer
+from .icb import load_tape
+from .computer import (
+    Computer, DECODE_TABLE, HALT, HALTED, INPUT_OP, OUTPUT, SUSPENDED, op_dict,
+)
+from .profiler import Profile, ProfiledComputer
+from .memory import ArrayMemory, CowMemory, Memory, MEMORY_INIT_VALUE
+from .shared import SharedProgram
+from .snapshot import Snapshot
+from .tracer import TracedComputer
+
+__version__ = '1.0.0'
+
+ENGINES = {
+    'interpreter': Computer,
+    'compiled': CompiledComputer,
+    'async': AsyncComputer,
+    'profiled': ProfiledComputer,
+    'traced': TracedComputer,
+}
+
+DEFAULT_ENGINE = 'interpreter'
+
+
+def get_engine(name=None):
+    name = name or os.environ.get('INTCODE_ENGINE', DEFAULT_ENGINE)
+    if name not in ENGINES:
+        raise ValueError("Unknown Intcode engine {!r}, expected one of {}".format(
+            name, ', '.join(ENGINES)
+        ))
+    return ENGINES[name]
+
+
+__all__ = [
+    'ArrayMemory',
+    'AsyncComputer',
+    'BatchComputer',
+    'CompiledComputer',
+    'Computer',
+    'CowMemory',
+    'DECODE_TABLE',
+    'ENGINES',
+    'HALT',
+    'HALTED',
+    'INPUT_OP',
+    'MEMORY_INIT_VALUE',
+    'Memory',
+    'OUTPUT',
+    'Profile',
+    'ProfiledComputer',
+    'SUSPENDED',
+    'SharedProgram',
+    'Snapshot',
+    'TracedComputer',
+    'connect',
+    'connect_loop',
+    'get_engine',
+    'load_tape',
+    'op_dict',
+    'run_network',
+]
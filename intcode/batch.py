@@ -0,0 +1,198 @@
+from collections import deque
+
+import numpy as np
+
+from .computer import Computer, DECODE_TABLE, HALT, INPUT_OP
+from .icb import OP_SIZES
+from .memory import DENSE_GROWTH, Memory
+
+# Results at least this big might not fit in 64 bits. Floats can't tell
+# exactly where that starts, so leave a margin
+OVERFLOW_LIMIT = 2.0 ** 62
+
+KEY_STRIDE = len(DECODE_TABLE)
+
+
+class BatchComputer:
+    """Many Intcode machines stepped together, with their tapes as rows of
+    one 2-D array of 64-bit cells.
+
+    Each round, machines are grouped by the instruction they are at, and
+    every group is stepped with one vectorized op, so machines running the
+    same program in the same way, e.g. on different inputs, cost little
+    more than one does. Machines that branch elsewhere simply form another
+    group. A machine that does anything a fixed width of 64-bit cells
+    can't do exactly (addresses past the tapes' width, results that might
+    overflow) is handed over to a plain Computer and finished there, so
+    results are always the same as running each machine on its own.
+
+    Raises OverflowError for tapes with cells that don't fit in 64 bits.
+    """
+    def __init__(self, tapes, in_vals=None, width=None):
+        n = len(tapes)
+        self.width = width or max(len(tape) for tape in tapes) + DENSE_GROWTH
+        self.tapes = np.zeros((n, self.width), dtype=np.int64)
+        for i, tape in enumerate(tapes):
+            self.tapes[i, :len(tape)] = tape
+
+        self.ptr = np.zeros(n, dtype=np.int64)
+        self.base = np.zeros(n, dtype=np.int64)
+        self.in_vals = [deque(vals or []) for vals in (in_vals or [None] * n)]
+        self.outs = [[] for _ in range(n)]
+        self.halted = np.zeros(n, dtype=bool)
+        self.waiting = np.zeros(n, dtype=bool)
+        self.ejected = np.zeros(n, dtype=bool)
+        # Ejected machine -> the Computer it was handed over to
+        self.fallback = {}
+
+    def __len__(self):
+        return len(self.tapes)
+
+    def add_in_vals(self, i, vals):
+        self.in_vals[i].extend(vals)
+
+    # Hand machines over to plain Computers, in the state they are in now
+    def eject(self, machines):
+        for i in machines.tolist():
+            computer = Computer(
+                tape=Memory(self.tapes[i].tolist()),
+                ptr=int(self.ptr[i]),
+                base=int(self.base[i]),
+            )
+            computer.in_vals = self.in_vals[i]
+            self.fallback[i] = computer
+        self.ejected[machines] = True
+
+    def is_halted(self, i):
+        if i in self.fallback:
+            return self.fallback[i].halted
+        return bool(self.halted[i])
+
+    # The cell at `address` on every machine's tape
+    def cells(self, address):
+        vals = self.tapes[:, address].tolist()
+        for i, computer in self.fallback.items():
+            vals[i] = computer.tape[address]
+        return vals
+
+    def run(self):
+        """Run every machine until it halts or wants input that isn't
+        queued, and get the outputs each has given so far"""
+        self.waiting[:] = False
+        while True:
+            active = np.flatnonzero(~(self.halted | self.waiting | self.ejected))
+            if not len(active):
+                break
+
+            ptrs = self.ptr[active]
+            off_tape = (ptrs < 0) | (ptrs >= self.width)
+            if off_tape.any():
+                self.eject(active[off_tape])
+                active = active[~off_tape]
+                ptrs = ptrs[~off_tape]
+
+            # Group by position and opcode, as a program may have changed
+            # its code on some machines and not others
+            keys = ptrs * KEY_STRIDE + self.tapes[active, ptrs]
+            if (keys == keys[0]).all():
+                self.step(active, int(ptrs[0]))
+                continue
+            order = np.argsort(keys, kind='stable')
+            starts = np.flatnonzero(np.diff(keys[order])) + 1
+            for group in np.split(active[order], starts):
+                self.step(group, int(self.ptr[group[0]]))
+
+        for i, computer in self.fallback.items():
+            self.outs[i].extend(computer.run_until_input())
+        return self.outs
+
+    # Step machines that are all at the same op, at `ptr`
+    def step(self, machines, ptr):
+        tapes = self.tapes
+        op_code = int(tapes[machines[0], ptr])
+        if not 0 <= op_code < len(DECODE_TABLE) or not DECODE_TABLE[op_code]:
+            raise ValueError("Invalid opcode {} at {}".format(op_code, ptr))
+        op_val, modes = DECODE_TABLE[op_code]
+        if op_val == HALT:
+            self.halted[machines] = True
+            return
+
+        n_params = OP_SIZES[op_val] - 1
+        if ptr + n_params >= self.width:
+            self.eject(machines)
+            return
+
+        # Where each param points, or the param itself when immediate
+        params = []
+        addresses = []
+        for k, mode in enumerate(modes[:n_params], start=1):
+            param = tapes[machines, ptr + k]
+            params.append(param)
+            addresses.append(
+                param if mode == 0 else self.base[machines] + param if mode == 2 else None
+            )
+
+        out_of_range = np.zeros(len(machines), dtype=bool)
+        for address in addresses:
+            if address is not None:
+                out_of_range |= (address < 0) | (address >= self.width)
+        if out_of_range.any():
+            self.eject(machines[out_of_range])
+            keep = ~out_of_range
+            machines = machines[keep]
+            params = [param[keep] for param in params]
+            addresses = [None if address is None else address[keep] for address in addresses]
+            if not len(machines):
+                return
+
+        def read(k):
+            if addresses[k] is None:
+                return params[k]
+            return tapes[machines, addresses[k]]
+
+        def write(k, vals):
+            address = ptr + k + 1 if addresses[k] is None else addresses[k]
+            tapes[machines, address] = vals
+
+        if op_val in (1, 2):
+            x, y = read(0), read(1)
+            if op_val == 1:
+                vals = x + y
+            else:
+                vals = x * y
+            exact = x.astype(np.float64)
+            exact = exact + y if op_val == 1 else exact * y
+            overflow = np.abs(exact) >= OVERFLOW_LIMIT
+            if overflow.any():
+                self.eject(machines[overflow])
+                keep = ~overflow
+                machines = machines[keep]
+                vals = vals[keep]
+                addresses = [None if address is None else address[keep] for address in addresses]
+            write(2, vals)
+            self.ptr[machines] = ptr + 4
+        elif op_val in (7, 8):
+            x, y = read(0), read(1)
+            vals = (x < y) if op_val == 7 else (x == y)
+            write(2, vals.astype(np.int64))
+            self.ptr[machines] = ptr + 4
+        elif op_val in (5, 6):
+            test = read(0)
+            taken = (test != 0) if op_val == 5 else (test == 0)
+            self.ptr[machines] = np.where(taken, read(1), ptr + 3)
+        elif op_val == 9:
+            self.base[machines] += read(0)
+            self.ptr[machines] = ptr + 2
+        elif op_val == INPUT_OP:
+            address = ptr + 1 if addresses[0] is None else addresses[0]
+            address = np.broadcast_to(address, machines.shape)
+            for i, cell in zip(machines, address):
+                if self.in_vals[i]:
+                    tapes[i, cell] = self.in_vals[i].popleft()
+                    self.ptr[i] = ptr + 2
+                else:
+                    self.waiting[i] = True
+        else:
+            for i, val in zip(machines, read(0).tolist()):
+                self.outs[i].append(val)
+            self.ptr[machines] = ptr + 2
@@ -0,0 +1,170 @@
+"""Benchmark every Intcode engine on the repo's programs.
+
+Run from the repo root with `python -m intcode.bench`.
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import namedtuple
+
+from . import ENGINES
+from .computer import Computer, INPUT_OP, op_dict
+from .icb import load_tape
+from .memory import ArrayMemory, Memory
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# `inputs` are queued up front; `feed` is given every time the program
+# wants more input after that (None if it never should)
+Program = namedtuple('Program', ['name', 'day', 'inputs', 'feed'])
+
+PROGRAMS = [
+    Program('day5 diagnostic', 'day5', [5], None),
+    Program('day7 amplifier', 'day7', [5, 0], 0),
+    Program('day9 BOOST', 'day9', [2], None),
+    Program('day11 painting', 'day11', [], 0),
+]
+
+
+def get_input(day):
+    return load_tape(os.path.join(REPO_ROOT, day, 'input.txt'))
+
+
+class BaselineComputer(Computer):
+    """The interpreter as it was before decoding went through a table and
+    the ops dict was built once, to measure against"""
+    def parse_opcode(self):
+        op_code = self.direct_lookup(self.ptr)
+        digits = [int(d) for d in str(op_code).zfill(5)]
+        mode3, mode2, mode1, _, op_val = digits
+        return op_val, (mode1, mode2, mode3)
+
+    def chooser(self, func, op_val):
+        return lambda *modes: func(op_dict[op_val], *modes)
+
+    def perform_op(self):
+        op_val, modes = self.parse_opcode()
+        self.build_ops()[op_val](*modes)
+
+    # The table-less decode above has to be used here too
+    def run_until_input(self, extra_in_vals=None):
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        outs = []
+        self.running = True
+        while not self.halted:
+            op_val, _ = self.parse_opcode()
+            if op_val == INPUT_OP and not self.in_vals:
+                break
+            self.perform_op()
+            if not self.running:
+                self.running = True
+                outs.append(self.out)
+        return outs
+
+
+BENCH_ENGINES = dict(baseline=BaselineComputer, **ENGINES)
+
+MEMORIES = {
+    'list': Memory,
+    'array': ArrayMemory,
+}
+
+# CPython shares these int objects, so a list holding them costs nothing
+# beyond its pointer
+SMALL_INTS = range(-5, 257)
+
+
+# Bytes held by a memory's image, counting the int objects a list points to
+def memory_bytes(memory):
+    image = memory.image
+    total = sys.getsizeof(image) + sys.getsizeof(memory.overflow)
+    if isinstance(image, list):
+        total += sum(sys.getsizeof(val) for val in image if val not in SMALL_INTS)
+    return total
+
+
+# Step the interpreter through a program, returning the steps taken
+def count_steps(program):
+    computer = Computer(tape=get_input(program.day), ptr=0, in_vals=program.inputs)
+    steps = 0
+    while not computer.halted:
+        op_val, _ = computer.parse_opcode()
+        if op_val == INPUT_OP and not computer.in_vals:
+            computer.add_in_val(program.feed)
+        computer.perform_op()
+        steps += 1
+    return steps
+
+
+def drive(computer, program):
+    computer.run_until_input()
+    while not computer.halted:
+        computer.run_until_input([program.feed])
+
+
+async def drive_async(computer, program):
+    # Only ever one fed value waiting, so the feeder can run forever
+    computer.inbox = asyncio.Queue(maxsize=1)
+
+    async def feeder():
+        while True:
+            await computer.inbox.put(program.feed)
+
+    feeding = asyncio.ensure_future(feeder())
+    await computer.run_async()
+    feeding.cancel()
+
+
+def time_engine(name, program):
+    computer = BENCH_ENGINES[name](
+        tape=get_input(program.day), ptr=0, in_vals=program.inputs
+    )
+    start = time.perf_counter()
+    if hasattr(computer, 'run_async'):
+        asyncio.run(drive_async(computer, program))
+    else:
+        drive(computer, program)
+    return time.perf_counter() - start, computer.tape.size
+
+
+def time_memory(name, program):
+    memory = MEMORIES[name](get_input(program.day))
+    computer = Computer(tape=memory, ptr=0, in_vals=program.inputs)
+    start = time.perf_counter()
+    drive(computer, program)
+    return time.perf_counter() - start, memory_bytes(memory)
+
+
+def main():
+    print("{:<16} {:<12} {:>9} {:>8} {:>12} {:>8} {:>6}".format(
+        'program', 'engine', 'steps', 'seconds', 'steps/s', 'speedup', 'cells'
+    ))
+    for program in PROGRAMS:
+        steps = count_steps(program)
+        timings = {name: time_engine(name, program) for name in BENCH_ENGINES}
+        baseline, _ = timings['baseline']
+        for name, (elapsed, cells) in timings.items():
+            print("{:<16} {:<12} {:>9} {:>8.3f} {:>12,.0f} {:>7.1f}x {:>6}".format(
+                program.name, name, steps, elapsed, steps / elapsed,
+                baseline / elapsed, cells,
+            ))
+
+    # The interpreter again, comparing memory backends
+    print()
+    print("{:<16} {:<12} {:>9} {:>8} {:>12} {:>8}".format(
+        'program', 'memory', 'steps', 'seconds', 'steps/s', 'bytes'
+    ))
+    for program in PROGRAMS:
+        steps = count_steps(program)
+        for name in MEMORIES:
+            elapsed, size = time_memory(name, program)
+            print("{:<16} {:<12} {:>9} {:>8.3f} {:>12,.0f} {:>8}".format(
+                program.name, name, steps, elapsed, steps / elapsed, size,
+            ))
+
+
+if __name__ == '__main__':
+    main()
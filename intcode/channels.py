@@ -0,0 +1,65 @@
+import asyncio
+
+from .computer import Computer, INPUT_OP
+
+# A machine that runs this many ops without blocking on input hands
+# control back to the event loop, so one busy machine can't starve others
+YIELD_EVERY = 1000
+
+OUTPUT_OP = 4
+
+
+class AsyncComputer(Computer):
+    """Computer whose input and output go through asyncio queues, so any
+    number of machines can be wired together and run on one event loop.
+
+    Reading input with nothing queued awaits `inbox` rather than calling
+    `input()`, and every output is put on `outbox` as well as kept in
+    `out`.
+    """
+    def __init__(self, tape, ptr, in_vals=None, base=0, verbose=False,
+                 inbox=None, outbox=None):
+        super().__init__(tape, ptr, in_vals, base, verbose=verbose)
+        self.inbox = inbox if inbox is not None else asyncio.Queue()
+        self.outbox = outbox if outbox is not None else asyncio.Queue()
+
+    async def run_async(self):
+        steps = 0
+        while not self.halted:
+            op_val, _ = self.parse_opcode()
+            if op_val == INPUT_OP and not self.in_vals:
+                self.add_in_val(await self.inbox.get())
+
+            self.perform_op()
+
+            if op_val == OUTPUT_OP:
+                await self.outbox.put(self.out)
+
+            steps += 1
+            if steps % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+        self.running = False
+        return self.out
+
+
+# Send everything `source` outputs to `dest` as input
+def connect(source, dest):
+    dest.inbox = source.outbox
+
+
+# Wire `computers` into a loop, each feeding the next and the last feeding
+# the first, as with day7's feedback amplifiers
+def connect_loop(computers):
+    for source, dest in zip(computers, computers[1:] + computers[:1]):
+        connect(source, dest)
+
+
+async def run_network_async(computers):
+    return await asyncio.gather(*(c.run_async() for c in computers))
+
+
+def run_network(computers):
+    """Run connected computers on one event loop until every one has
+    halted, and get each one's last output"""
+    return asyncio.run(run_network_async(computers))
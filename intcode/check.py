@@ -0,0 +1,74 @@
+"""Run small Intcode programs that have broken an engine before on every
+engine, and check each gives what the interpreter gives.
+
+Run from the repo root with `python -m intcode.check`.
+"""
+import sys
+
+from . import ENGINES
+from .computer import Computer
+
+# (name, program, inputs)
+PROGRAMS = [
+    # A jump always taken, straight to an input op
+    ('folded jump into input', [1105, 1, 4, 99, 3, 0, 4, 0, 99], [7]),
+    # A jump never taken, followed by an input op
+    ('folded jump before input', [1105, 0, 7, 3, 0, 4, 0, 99], [5]),
+    # A loop whose block is usually left at its first op, counting down
+    ('early exit from a loop', [1006, 13, 10, 1001, 13, -1, 13, 1105, 1, 0, 4, 13, 99, 3], []),
+]
+
+# Each program is also run with every step budget up to this, checking the
+# machine stops in the same state as the interpreter's would
+MAX_BUDGET = 16
+
+
+def result(engine, program, inputs):
+    computer = engine(tape=program[:], ptr=0, in_vals=inputs)
+    outs = computer.run_until_input()
+    return outs, [computer.tape[ix] for ix in range(len(program))]
+
+
+def limited_result(engine, program, inputs, max_steps):
+    computer = engine(tape=program[:], ptr=0, in_vals=inputs)
+    computer.run(max_steps=max_steps)
+    return (
+        computer.status, computer.ptr, computer.base,
+        [computer.tape[ix] for ix in range(len(program))],
+    )
+
+
+def check(name, engine_name, run, expected):
+    try:
+        got = run()
+    except Exception as e:
+        got = repr(e)
+    if got == expected:
+        return 0
+    print('FAIL {} on {}: expected {}, got {}'.format(
+        name, engine_name, expected, got
+    ))
+    return 1
+
+
+def main():
+    failures = 0
+    for name, program, inputs in PROGRAMS:
+        expected = result(Computer, program, inputs)
+        for engine_name, engine in ENGINES.items():
+            failures += check(name, engine_name, lambda: result(engine, program, inputs), expected)
+
+        for max_steps in range(MAX_BUDGET + 1):
+            expected = limited_result(Computer, program, inputs, max_steps)
+            for engine_name, engine in ENGINES.items():
+                failures += check(
+                    '{} in {} steps'.format(name, max_steps), engine_name,
+                    lambda: limited_result(engine, program, inputs, max_steps),
+                    expected,
+                )
+    print('{} programs, {} failures'.format(len(PROGRAMS), failures))
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
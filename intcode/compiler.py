@@ -0,0 +1,326 @@
+import time
+
+from .computer import (
+    CLOCK_EVERY, Computer, DECODE_TABLE, HALTED, INPUT_OP, OUTPUT, Port,
+    SUSPENDED, op_dict,
+)
+
+# Ops that can be compiled into the body of a block, and the jumps that
+# end one. Anything else (input, output, halt) is left to the interpreter
+BODY_OPS = {1: '{} + {}', 2: '{} * {}', 7: 'int({} < {})', 8: 'int({} == {})'}
+JUMP_OPS = {5: '{} != 0', 6: '{} == 0'}
+BASE_OP = 9
+
+
+# Python expression for the cell at a fixed address. Cells inside the
+# memory's private image can skip its checks, as that never shrinks
+def cell_source(tape, address):
+    if 0 <= address < len(tape.private_image):
+        return 'image[{}]'.format(address)
+    return 'tape[{}]'.format(address)
+
+
+# Python expression for the number stored in `cell`: a constant, unless
+# the cell is volatile (it has been written to while running), in which
+# case it is read from memory every time
+def operand_source(tape, cell, volatile):
+    if cell in volatile:
+        return cell_source(tape, cell)
+    return str(tape[cell])
+
+
+# Python expression for the param in `cell`, given the mode it is read in
+def param_source(tape, mode, cell, volatile):
+    operand = operand_source(tape, cell, volatile)
+    if mode == 0:
+        if cell in volatile:
+            return 'tape[{}]'.format(operand)
+        return cell_source(tape, tape[cell])
+    elif mode == 1:
+        return operand
+    elif mode == 2:
+        return relative_source(operand)
+
+
+# Python expression for a relative param. `size` is the private image
+# length when the block was entered: that only grows, so a cell under it
+# is always in the image, and anything else goes through the memory
+def relative_source(offset):
+    return '(image[b] if 0 <= (b := base + {}) < size else tape[b])'.format(offset)
+
+
+# Python statements writing `expression` to the address a param in
+# `cell` gives, leaving that address in `a`
+def assign_source(tape, mode, cell, expression, volatile):
+    if mode == 0 and cell not in volatile:
+        address = tape[cell]
+        return ['a = {}'.format(address), cell_source(tape, address) + ' = ' + expression]
+    elif mode == 1:
+        return ['a = {}'.format(cell), cell_source(tape, cell) + ' = ' + expression]
+
+    operand = operand_source(tape, cell, volatile)
+    return [
+        'v = ' + expression,
+        'a = ' + (operand if mode == 0 else 'base + ' + operand),
+        'if 0 <= a < size:',
+        '    image[a] = v',
+        'else:',
+        '    tape[a] = v',
+    ]
+
+
+class CompiledComputer(Computer):
+    """Computer that translates straight-line runs of ops into Python
+    functions the first time they are reached, and runs those instead of
+    interpreting op by op.
+
+    A block is invalidated as soon as anything writes into its cells, and
+    a jump into the middle of a block is interpreted, so self-modifying
+    programs still behave exactly as they do under `Computer.run`. A cell
+    that has been written is treated as data from then on: blocks
+    compiled later read it from memory instead of baking it in.
+    """
+    def __init__(self, tape, ptr, in_vals=None, base=0, verbose=False):
+        super().__init__(tape, ptr, in_vals, base, verbose=verbose)
+        # Block start -> compiled function, or False where there is
+        # nothing to compile and the interpreter must take the op
+        self.blocks = {}
+        # Every cell covered by a compiled block -> the starts of the
+        # blocks covering it
+        self.code = {}
+        # Cells where a compiled op begins, as opposed to its params
+        self.heads = set()
+        # Cells that have been written over compiled code
+        self.volatile = set()
+
+    def direct_assign(self, ptr, val):
+        self.tape[ptr] = val
+        if ptr in self.code:
+            self.invalidate(ptr)
+
+    def address_assign(self, ptr, val):
+        self.direct_assign(self.tape[ptr], val)
+
+    # Compiled blocks were built from the old memory, so all of them go
+    def restore(self, snapshot):
+        super().restore(snapshot)
+        self.blocks.clear()
+        self.code.clear()
+        self.heads.clear()
+        self.volatile.clear()
+
+    # Drop the blocks covering `cell` so they are recompiled on next visit
+    def invalidate(self, cell):
+        self.volatile.add(cell)
+        for start in self.code.pop(cell):
+            self.blocks.pop(start, None)
+        # Rebuild the cell maps from the blocks that are left, in place as
+        # the run loop holds on to them
+        self.code.clear()
+        self.heads.clear()
+        for block in self.blocks.values():
+            if block:
+                self.register(block)
+
+    def register(self, block):
+        for ix in block.cells:
+            self.code.setdefault(ix, set()).add(block.start)
+        self.heads.update(block.heads)
+
+    # Translate the ops from `start` into a single function of the
+    # computer. Unconditional jumps to a fixed address are followed, and
+    # the block ends at the first other jump, I/O op or halt
+    def compile_block(self, start):
+        tape = self.tape
+        volatile = self.volatile
+        lines = []
+        cells = set()
+        heads = []
+        ptr = start
+        base_changed = False
+
+        # Leave the block for `next_ptr`, having run every op so far
+        def exit_to(next_ptr, indent=''):
+            if base_changed:
+                lines.append(indent + 'c.base = base')
+            lines.append(indent + 'return {}, {}'.format(next_ptr, len(heads)))
+
+        while 0 <= ptr < len(tape) and ptr not in cells and ptr not in volatile:
+            op_code = tape[ptr]
+            if not 0 <= op_code < len(DECODE_TABLE) or not DECODE_TABLE[op_code]:
+                break
+            op_val, (mode1, mode2, mode3) = DECODE_TABLE[op_code]
+            if op_val not in BODY_OPS and op_val not in JUMP_OPS and op_val != BASE_OP:
+                break
+
+            heads.append(ptr)
+            size = 2 if op_val == BASE_OP else 3 if op_val in JUMP_OPS else 4
+            cells.update(ix for ix in range(ptr, ptr + size) if ix not in volatile)
+
+            if op_val in BODY_OPS:
+                expression = BODY_OPS[op_val].format(
+                    param_source(tape, mode1, ptr + 1, volatile),
+                    param_source(tape, mode2, ptr + 2, volatile),
+                )
+                lines.extend(assign_source(tape, mode3, ptr + 3, expression, volatile))
+                # Leave the block if that write landed on compiled code
+                lines.append('if a in code:')
+                lines.append('    c.invalidate(a)')
+                exit_to(ptr + 4, indent='    ')
+                ptr += 4
+            elif op_val == BASE_OP:
+                lines.append('base += {}'.format(param_source(tape, mode1, ptr + 1, volatile)))
+                base_changed = True
+                ptr += 2
+            elif mode1 == 1 and ptr + 1 not in volatile:
+                # The condition is known now, so the jump is either never
+                # taken, or always taken and followed when its target is
+                taken = op_dict[op_val](tape[ptr + 1])
+                if not taken:
+                    ptr += 3
+                elif mode2 == 1 and ptr + 2 not in volatile:
+                    ptr = tape[ptr + 2]
+                else:
+                    exit_to(param_source(tape, mode2, ptr + 2, volatile))
+                    break
+            else:
+                condition = JUMP_OPS[op_val].format(
+                    param_source(tape, mode1, ptr + 1, volatile)
+                )
+                lines.append('if {}:'.format(condition))
+                exit_to(param_source(tape, mode2, ptr + 2, volatile), indent='    ')
+                ptr += 3
+        else:
+            # Ran into an op already in this block or off the tape
+            exit_to(ptr)
+
+        if not heads:
+            self.blocks[start] = False
+            return False
+
+        # Jumps folded away can leave nothing compiled before an op the
+        # interpreter has to take, so the block may be empty here
+        if not lines or not lines[-1].startswith('return'):
+            exit_to(ptr)
+
+        source = 'def block(c, tape, image, code):\n'
+        if any('base' in line for line in lines):
+            source += '    base = c.base\n'
+        if any('size' in line for line in lines):
+            source += '    size = len(image)\n'
+        source += ''.join('    {}\n'.format(line) for line in lines)
+        namespace = {}
+        exec(compile(source, '<block {}>'.format(start), 'exec'), namespace)
+
+        block = namespace['block']
+        block.start = start
+        block.cells = cells
+        block.heads = heads
+        block.steps = len(heads)
+        self.blocks[start] = block
+        self.register(block)
+        return block
+
+    # Run compiled blocks, interpreting the ops that can't be compiled,
+    # until the program halts or (with `output_mode`) gives output or
+    # (with `until_input`) wants input that isn't queued. If `outs` is
+    # given, outputs are collected there instead of stopping the run.
+    # Blocks return how many ops they ran along with where to go next, so
+    # `max_steps` counts exactly the ops `Computer.run` would
+    def run_blocks(self, output_mode=False, until_input=False, outs=None,
+                   max_steps=None, deadline=None):
+        blocks = self.blocks
+        tape = self.tape
+        image = tape.private_image
+        code = self.code
+        ptr = self.ptr
+        limited = max_steps is not None or deadline is not None
+        steps = 0
+        next_check = 0
+        while True:
+            if limited:
+                # As with the interpreter, a run stopped at a halt has
+                # halted rather than been suspended
+                if max_steps is not None and steps >= max_steps:
+                    self.ptr = ptr
+                    return HALTED if self.halted else SUSPENDED
+                if deadline is not None and steps >= next_check:
+                    next_check = steps + CLOCK_EVERY
+                    if time.monotonic() >= deadline:
+                        self.ptr = ptr
+                        return HALTED if self.halted else SUSPENDED
+
+            block = blocks.get(ptr)
+            if block is None:
+                # Jumped into the params of a block, interpret from here
+                if ptr in code and ptr not in self.heads:
+                    block = False
+                else:
+                    block = self.compile_block(ptr)
+
+            if block and max_steps is not None and steps + block.steps > max_steps:
+                # The block might run past the budget, so take the
+                # remaining steps one op at a time
+                block = False
+
+            if block:
+                ptr, ran = block(self, tape, image, code)
+                steps += ran
+                continue
+
+            self.ptr = ptr
+            if self.halted:
+                return HALTED
+            op_val, modes = self.parse_opcode()
+            if until_input and op_val == INPUT_OP and not self.in_vals:
+                return None
+            self.ops[op_val](*modes)
+            ptr = self.ptr
+            steps += 1
+
+            if not self.running:
+                if output_mode:
+                    return OUTPUT
+                if outs is not None:
+                    self.running = True
+                    try:
+                        outs.append(self.out)
+                    except BaseException:
+                        # Only a Port's write can raise, stopping run_io
+                        self.status = SUSPENDED
+                        raise
+
+    def run(self, output_mode=False, extra_in_vals=None, max_steps=None,
+            deadline=None):
+        self.running = True
+
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        self.status = self.run_blocks(
+            output_mode=output_mode, max_steps=max_steps, deadline=deadline
+        )
+        if self.halted:
+            self.running = False
+        return self.out
+
+    def run_until_input(self, extra_in_vals=None):
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        outs = []
+        self.running = True
+        self.run_blocks(until_input=True, outs=outs)
+        return outs
+
+    def run_io(self, read, write):
+        in_vals = self.in_vals
+        self.in_vals = Port(read)
+        self.running = True
+        try:
+            self.run_blocks(outs=Port(write=write))
+        finally:
+            self.in_vals = in_vals
+
+        self.running = False
+        self.status = HALTED
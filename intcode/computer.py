@@ -0,0 +1,336 @@
+import time
+from collections import deque
+from functools import partial
+
+from .memory import Memory
+from .snapshot import Snapshot
+
+
+op_dict = {
+    1: lambda x, y: x + y,
+    2: lambda x, y: x * y,
+    5: lambda x: x != 0,
+    6: lambda x: x == 0,
+    7: lambda x, y: int(x < y),
+    8: lambda x, y: int(x == y),
+}
+
+INPUT_OP = 3
+HALT = 99
+MAX_OP_CODE = 22299
+
+# Why `run` returned, left in `Computer.status`
+HALTED = 'halted'
+OUTPUT = 'output'
+SUSPENDED = 'suspended'
+
+# Steps between looking at the clock when running to a deadline
+CLOCK_EVERY = 1000
+
+
+# Table from every valid raw opcode to (op_val, modes), built
+# once so decoding an instruction is a single list index
+def build_decode_table():
+    table = [None] * (MAX_OP_CODE + 1)
+    for op_val in list(op_dict) + [3, 4, 9, HALT]:
+        for mode1 in range(3):
+            for mode2 in range(3):
+                for mode3 in range(3):
+                    op_code = op_val + 100*mode1 + 1000*mode2 + 10000*mode3
+                    table[op_code] = (op_val, (mode1, mode2, mode3))
+    return table
+
+DECODE_TABLE = build_decode_table()
+
+
+class Port:
+    """Stands in for a machine's input queue or output list when it is
+    wired to functions instead: taking an input calls `read()`, of which
+    there is always another, and adding an output calls `write(val)`"""
+    def __init__(self, read=None, write=None):
+        self.popleft = read
+        self.append = write
+
+    def __bool__(self):
+        return True
+
+
+class Computer:
+    def __init__(self, tape, ptr, in_vals=None, base=0, verbose=False):
+        self.tape = Memory(tape) if isinstance(tape, list) else tape
+        self.ptr = ptr
+        # Queue of inputs not yet read, consumed from the left
+        self.in_vals = deque(in_vals or [])
+        self.base = base
+        self.out = None
+        self.running = True
+        self.status = None
+        self.ops = self.build_ops()
+        self.verbose = verbose
+
+    # A copy of this computer to run on independently. Memory is copied
+    # only as far as the memory type needs: CowMemory shares the image
+    def clone(self):
+        computer = type(self)(
+            tape=self.tape.clone(),
+            ptr=self.ptr,
+            in_vals=self.in_vals,
+            base=self.base,
+            verbose=self.verbose,
+        )
+        computer.out = self.out
+        return computer
+
+    # The machine's state, small enough to keep many of: memory is only
+    # held as its differences from the program it was loaded with, which
+    # the memory keeps
+    def snapshot(self):
+        return Snapshot(
+            self.ptr, self.base, tuple(self.in_vals), self.out,
+            self.tape.delta(),
+        )
+
+    # Put the machine back in the state of a snapshot taken of it, or of
+    # any machine loaded with the same program
+    def restore(self, snapshot):
+        self.ptr = snapshot.ptr
+        self.base = snapshot.base
+        self.in_vals = deque(snapshot.in_vals)
+        self.out = snapshot.out
+        self.running = True
+        self.tape.restore(snapshot.delta)
+
+    # Get the value directly at ptr
+    def direct_lookup(self, ptr):
+        return self.tape[ptr]
+
+    # Set the value at ptr to `val`
+    def direct_assign(self, ptr, val):
+        self.tape[ptr] = val
+
+    # Lookup the value at the address given by the value at the tapehead
+    def address_lookup(self, ptr):
+        return self.tape[self.tape[ptr]]
+    
+    # Set the value at the address given by the tapehead to val
+    def address_assign(self, ptr, val):
+        self.tape[self.tape[ptr]] = val
+
+    # Handle which lookup to use given mode
+    def getter(self, mode, ix):
+        if mode == 0:
+            return self.address_lookup(ix)
+        elif mode == 1:
+            return self.direct_lookup(ix)
+        elif mode == 2:
+            offset = self.direct_lookup(ix)
+            return self.direct_lookup(self.base + offset)
+    
+    # Handle which assign to use given mode
+    def setter(self, mode, ix, val):
+        if mode == 0:
+            self.address_assign(ix, val)
+        elif mode == 1:
+            self.direct_assign(ix, val)
+        elif mode == 2:
+            offset = self.direct_lookup(ix)
+            return self.direct_assign(self.base + offset, val)
+
+    @property
+    def tape_head(self):
+        return self.direct_lookup(self.ptr)
+
+    @property
+    def halted(self):
+        return self.tape_head == HALT
+
+    lookup = getter
+    assign = setter
+
+    def add_in_val(self, val):
+        self.in_vals.append(val)
+
+    # Queue many inputs at once, from any iterable of ints (a list, a
+    # generator, bytes, an array...)
+    def add_in_vals(self, vals):
+        self.in_vals.extend(vals)
+
+    # Lookup the param `offset` cells after the op
+    def get_param(self, mode, offset):
+        return self.lookup(mode, self.ptr + offset)
+
+    # FUNCTIONS FOR PERFORMING OPERATIONS
+    # ------------------------------------
+
+    def binary_op(self, op, mode1, mode2, mode3):
+        val = op(self.get_param(mode1, 1), self.get_param(mode2, 2))
+        self.assign(mode3, self.ptr + 3, val)
+        self.ptr += 4
+
+
+    def jump(self, op, mode1, mode2, mode3):
+        if op(self.get_param(mode1, 1)):
+            self.ptr = self.get_param(mode2, 2)
+        else:
+            self.ptr += 3
+
+    
+    def adjust_base(self, mode, *modes):
+        self.base += self.get_param(mode, 1)
+        self.ptr += 2
+        
+
+    def get_input(self, mode, *modes, in_val=None):
+        if not self.in_vals:
+            in_val = int(input("Enter input: "))
+        else:
+            in_val = self.in_vals.popleft()
+        self.assign(mode, self.ptr + 1, in_val)
+        self.ptr += 2
+
+
+    def get_output(self, mode, *modes):
+        self.out = self.get_param(mode, 1)
+        self.ptr += 2
+        self.running = False
+        if self.verbose:
+            print("PROGRAM OUTPUT: {}".format(self.out))
+
+
+    # Built once per computer, so dispatching an op allocates nothing
+    def build_ops(self):
+        return { 
+            1 : self.chooser(self.binary_op, 1),
+            2 : self.chooser(self.binary_op, 2),
+            3 : self.get_input,
+            4 : self.get_output,
+            5 : self.chooser(self.jump, 5),
+            6 : self.chooser(self.jump, 6),
+            7 : self.chooser(self.binary_op, 7),
+            8 : self.chooser(self.binary_op, 8),
+            9 : self.adjust_base,
+        }
+    
+    # For the functions that depend on op_val, bind the op function here
+    # so the ops dict generalizes to only take mode
+    def chooser(self, func, op_val):
+        return partial(func, op_dict[op_val])
+
+    # Get the opcode value and 3 modes
+    def parse_opcode(self):
+        op_code = self.direct_lookup(self.ptr)
+        if 0 <= op_code < len(DECODE_TABLE) and DECODE_TABLE[op_code]:
+            return DECODE_TABLE[op_code]
+        raise ValueError("Invalid opcode {} at {}".format(op_code, self.ptr))
+
+    # Given a ptr to the op, perform the op
+    def perform_op(self):
+        op_val, modes = self.parse_opcode()
+        self.ops[op_val](*modes)
+
+    def run(self, output_mode=False, extra_in_vals=None, max_steps=None,
+            deadline=None):
+        # For output mode, can be used to stop the computer when it
+        # has just given *output* but not necessarily halted.
+        # With `max_steps` or `deadline` (a time.monotonic() time), the run
+        # is suspended once it has taken that many steps or reached that
+        # time, and calling run again carries on from there. `status` says
+        # which of these stopped it
+        self.running = True
+
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        if max_steps is not None or deadline is not None:
+            return self.run_limited(output_mode, max_steps, deadline)
+
+        while not self.halted:
+            self.perform_op()
+
+            if not self.running and output_mode:
+                self.status = OUTPUT
+                return self.out
+
+        self.running = False
+        self.status = HALTED
+        return self.out
+
+    # `run` with a step budget or deadline, kept apart so that unlimited
+    # runs don't pay for the checks
+    def run_limited(self, output_mode, max_steps, deadline):
+        steps = 0
+        while not self.halted:
+            if steps == max_steps or (
+                deadline is not None and steps % CLOCK_EVERY == 0
+                and time.monotonic() >= deadline
+            ):
+                self.status = SUSPENDED
+                return self.out
+
+            self.perform_op()
+            steps += 1
+
+            if not self.running and output_mode:
+                self.status = OUTPUT
+                return self.out
+
+        self.running = False
+        self.status = HALTED
+        return self.out
+
+    # Generator over the program's outputs, running only as far as is
+    # needed for the next one
+    def stream(self, extra_in_vals=None):
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        self.running = True
+        while not self.halted:
+            self.perform_op()
+            if not self.running:
+                self.running = True
+                yield self.out
+
+    # Run until the program halts, reading every input from `read()` and
+    # handing every output to `write(val)` as it is given, without
+    # returning in between. Anything `write` raises stops the run, with
+    # the machine left just after that output and its status SUSPENDED
+    def run_io(self, read, write):
+        in_vals = self.in_vals
+        self.in_vals = Port(read)
+        self.running = True
+        ops = self.ops
+        try:
+            while not self.halted:
+                op_val, modes = self.parse_opcode()
+                ops[op_val](*modes)
+                if not self.running:
+                    self.running = True
+                    try:
+                        write(self.out)
+                    except BaseException:
+                        self.status = SUSPENDED
+                        raise
+        finally:
+            self.in_vals = in_vals
+
+        self.running = False
+        self.status = HALTED
+
+    # Run until the program halts or wants input that isn't queued, and
+    # get every output given along the way
+    def run_until_input(self, extra_in_vals=None):
+        if extra_in_vals:
+            self.add_in_vals(extra_in_vals)
+
+        outs = []
+        self.running = True
+        while not self.halted:
+            op_val, modes = self.parse_opcode()
+            if op_val == INPUT_OP and not self.in_vals:
+                break
+            self.ops[op_val](*modes)
+            if not self.running:
+                self.running = True
+                outs.append(self.out)
+        return outs
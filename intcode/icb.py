@@ -0,0 +1,172 @@
+"""Compiled Intcode program cache.
+
+An .icb file sits next to a program's source (input.txt -> input.txt.icb)
+and holds the parsed tape as packed 64-bit cells, with the instruction
+metadata a linear decode of it gives: the op and packed modes at every
+cell where an instruction starts, and the addresses where basic blocks
+begin. It is mapped into memory rather than read, and rebuilt whenever
+the hash of the source no longer matches the one stored with it.
+
+Layout, all little-endian:
+
+    header   magic, version, source sha256, cell count, leader count
+    cells    int64 per cell
+    leaders  int64 per basic block start
+    ops      uint8 per cell, the op starting there or 0
+    modes    uint8 per cell, mode1 + 3*mode2 + 9*mode3
+"""
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+from .computer import DECODE_TABLE, HALT
+from .memory import ARRAY_TYPECODE
+
+MAGIC = b'ICB1'
+VERSION = 1
+HEADER = struct.Struct('<4sH32sQQ10x')
+
+SUFFIX = '.icb'
+
+# Cells taken by each op, including the op itself
+OP_SIZES = {1: 4, 2: 4, 3: 2, 4: 2, 5: 3, 6: 3, 7: 4, 8: 4, 9: 2, HALT: 1}
+JUMP_OPS = (5, 6)
+# Ops after which a new basic block starts
+BLOCK_ENDS = (3, 4, 5, 6, HALT)
+
+
+class ProgramImage:
+    """A program loaded from its .icb file. `cells`, `ops`, `modes` and
+    `leaders` are views straight onto the mapped file"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+
+        magic, version, self.source_hash, size, n_leaders = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            view.release()
+            self.map.close()
+            raise ValueError("{} is not a version {} .icb file".format(path, VERSION))
+
+        offset = HEADER.size
+        self.cells = view[offset:offset + 8*size].cast(ARRAY_TYPECODE)
+        offset += 8*size
+        self.leaders = view[offset:offset + 8*n_leaders].cast(ARRAY_TYPECODE)
+        offset += 8*n_leaders
+        self.ops = view[offset:offset + size]
+        offset += size
+        self.modes = view[offset:offset + size]
+        view.release()
+
+    def __len__(self):
+        return len(self.cells)
+
+    # The tape as a list, for the day scripts' Computers
+    def tape(self):
+        return self.cells.tolist()
+
+    def close(self):
+        for view in (self.cells, self.leaders, self.ops, self.modes):
+            view.release()
+        self.map.close()
+
+
+def source_hash(source):
+    return hashlib.sha256(source).digest()
+
+
+def parse(source):
+    return list(map(int, source.decode().split(',')))
+
+
+# Decode the tape linearly from 0, returning the ops, packed modes and
+# basic block starts. Cells that don't decode are taken to be data
+def decode(tape):
+    ops = bytearray(len(tape))
+    modes = bytearray(len(tape))
+    leaders = {0}
+
+    ptr = 0
+    while ptr < len(tape):
+        op_code = tape[ptr]
+        if not 0 <= op_code < len(DECODE_TABLE) or not DECODE_TABLE[op_code]:
+            ptr += 1
+            continue
+
+        op_val, (mode1, mode2, mode3) = DECODE_TABLE[op_code]
+        ops[ptr] = op_val
+        modes[ptr] = mode1 + 3*mode2 + 9*mode3
+
+        size = OP_SIZES[op_val]
+        if op_val in JUMP_OPS and mode2 == 1 and ptr + 2 < len(tape):
+            leaders.add(tape[ptr + 2])
+        if op_val in BLOCK_ENDS:
+            leaders.add(ptr + size)
+        ptr += size
+
+    leaders = sorted(ix for ix in leaders if 0 <= ix < len(tape))
+    return ops, modes, leaders
+
+
+def build(source_path, icb_path):
+    with open(source_path, 'rb') as f:
+        source = f.read()
+    tape = parse(source)
+    ops, modes, leaders = decode(tape)
+
+    # Packed first, as cells too big for 64 bits raise OverflowError here
+    cells = array(ARRAY_TYPECODE, tape).tobytes()
+    packed_leaders = array(ARRAY_TYPECODE, leaders).tobytes()
+
+    # Written aside and moved into place, so a reader never maps half a file
+    tmp_path = icb_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, source_hash(source), len(tape), len(leaders)))
+            f.write(cells)
+            f.write(packed_leaders)
+            f.write(ops)
+            f.write(modes)
+        os.replace(tmp_path, icb_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_fresh(source_path, icb_path):
+    if not os.path.exists(icb_path):
+        return False
+    with open(icb_path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    magic, version, stored_hash, _, _ = HEADER.unpack(header)
+    with open(source_path, 'rb') as f:
+        return (magic, version, stored_hash) == (MAGIC, VERSION, source_hash(f.read()))
+
+
+def load(source_path):
+    """Load the program at `source_path` through its .icb cache, building
+    or rebuilding the cache first if it is missing or stale"""
+    icb_path = source_path + SUFFIX
+    if not is_fresh(source_path, icb_path):
+        build(source_path, icb_path)
+    return ProgramImage(icb_path)
+
+
+def load_tape(source_path):
+    """The program at `source_path` as a list of ints, read through its
+    .icb cache. Programs with cells too big for 64 bits are parsed
+    directly instead"""
+    try:
+        image = load(source_path)
+    except OverflowError:
+        with open(source_path, 'rb') as f:
+            return parse(f.read())
+    tape = image.tape()
+    image.close()
+    return tape
@@ -0,0 +1,204 @@
+import hashlib
+from array import array
+
+MEMORY_INIT_VALUE = 0
+
+# Packed signed 64-bit cells
+ARRAY_TYPECODE = 'q'
+
+# Writes this close past the end of the image extend it instead of going
+# to the overflow map, so a stack just after the program stays dense
+DENSE_GROWTH = 1024
+
+
+class Memory:
+    """Intcode memory: the program image in a dense list, and any cell
+    written far past its end in a sparse overflow map, so every
+    non-negative address can be used without padding the tape up front.
+    The image as it was loaded is kept frozen as `program`, which
+    snapshots are taken against.
+    """
+    def __init__(self, image, program=None):
+        self.program = tuple(image) if program is None else program
+        self.image = image
+        self.overflow = {}
+
+    def __len__(self):
+        return len(self.image)
+
+    def __getitem__(self, ix):
+        if 0 <= ix < len(self.image):
+            return self.image[ix]
+        elif ix < 0:
+            raise IndexError("Negative address {}".format(ix))
+        return self.overflow.get(ix, MEMORY_INIT_VALUE)
+
+    def __setitem__(self, ix, val):
+        size = len(self.image)
+        if 0 <= ix < size:
+            self.image[ix] = val
+        elif ix < 0:
+            raise IndexError("Negative address {}".format(ix))
+        elif ix < size + DENSE_GROWTH:
+            self.grow(ix + 1)
+            self.image[ix] = val
+        else:
+            self.overflow[ix] = val
+
+    # Extend the image to `size` cells, moving in any overflow cells
+    def grow(self, size):
+        self.image.extend(
+            self.overflow.pop(ix, MEMORY_INIT_VALUE)
+            for ix in range(len(self.image), size)
+        )
+
+    # The cells that can be indexed directly, bypassing the checks above
+    @property
+    def private_image(self):
+        return self.image
+
+    # Number of cells actually held, image plus overflow
+    @property
+    def size(self):
+        return len(self.image) + len(self.overflow)
+
+    # An independent copy of this memory, loaded from the same program
+    def clone(self):
+        memory = type(self)(self.image[:], self.program)
+        memory.overflow = self.overflow.copy()
+        return memory
+
+    # The cells that differ from the program this memory was loaded with,
+    # as {address: value}
+    def delta(self):
+        program = self.program
+        image = self.image
+        changes = {
+            ix: val for ix, (val, original) in enumerate(zip(image, program))
+            if val != original
+        }
+        changes.update(
+            (ix, image[ix]) for ix in range(len(program), len(image))
+            if image[ix] != MEMORY_INIT_VALUE
+        )
+        changes.update(self.overflow)
+        return changes
+
+    # Reset to a copy of the program with `delta` written over it
+    def restore(self, delta):
+        self.image = type(self)(list(self.program), self.program).image
+        self.overflow = {}
+        for ix in sorted(delta):
+            self[ix] = delta[ix]
+
+
+class ArrayMemory(Memory):
+    """Memory with the image packed into an array of 64-bit ints rather
+    than a list of int objects. The first value that doesn't fit in 64 bits
+    switches the image over to a list for good, so results are the same
+    as with Memory, just without the packing.
+    """
+    def __init__(self, image, program=None):
+        if program is None:
+            program = tuple(image)
+        try:
+            image = array(ARRAY_TYPECODE, image)
+        except OverflowError:
+            image = list(image)
+        super().__init__(image, program)
+
+    @property
+    def packed(self):
+        return isinstance(self.image, array)
+
+    def unpack(self):
+        self.image = list(self.image)
+
+    def __setitem__(self, ix, val):
+        try:
+            super().__setitem__(ix, val)
+        except OverflowError:
+            self.unpack()
+            super().__setitem__(ix, val)
+
+    def grow(self, size):
+        vals = [
+            self.overflow.pop(ix, MEMORY_INIT_VALUE)
+            for ix in range(len(self.image), size)
+        ]
+        start = len(self.image)
+        try:
+            self.image.extend(vals)
+        except OverflowError:
+            # The array keeps whatever it took before the overflow
+            del self.image[start:]
+            self.unpack()
+            self.image.extend(vals)
+
+    # The image can change type under a compiled block, so never index it
+    # directly
+    @property
+    def private_image(self):
+        return []
+
+
+class CowMemory:
+    """Copy-on-write Intcode memory: a read-only program image shared by
+    every clone, and the cells this memory has written on top of it.
+    Cloning only copies those writes, so forking many machines from one
+    program costs next to nothing.
+    """
+    def __init__(self, base, writes=None, base_digest=None):
+        self.base = base
+        self.writes = {} if writes is None else writes
+        # Digesting the image is O(n), so it is done once and shared by clones
+        self.base_digest = base_digest
+
+    def __len__(self):
+        return len(self.base)
+
+    def __getitem__(self, ix):
+        if ix in self.writes:
+            return self.writes[ix]
+        elif 0 <= ix < len(self.base):
+            return self.base[ix]
+        elif ix < 0:
+            raise IndexError("Negative address {}".format(ix))
+        return MEMORY_INIT_VALUE
+
+    def __setitem__(self, ix, val):
+        if ix < 0:
+            raise IndexError("Negative address {}".format(ix))
+        self.writes[ix] = val
+
+    # No cell is safe to index directly, any might have been written
+    @property
+    def private_image(self):
+        return []
+
+    @property
+    def size(self):
+        return len(self.base) + len(self.writes)
+
+    def clone(self):
+        return CowMemory(self.base, self.writes.copy(), self.base_digest)
+
+    # The base is never written, so it is the program to diff against
+    def delta(self):
+        base = self.base
+        return {
+            ix: val for ix, val in self.writes.items()
+            if val != (base[ix] if ix < len(base) else MEMORY_INIT_VALUE)
+        }
+
+    def restore(self, delta):
+        self.writes = dict(delta)
+
+    # Key identifying the current contents, e.g. to cache results by
+    # program: a sha256 digest of the image and the writes made over it,
+    # so two different programs never share one
+    def fingerprint(self):
+        if self.base_digest is None:
+            source = ','.join(map(str, self.base)).encode()
+            self.base_digest = hashlib.sha256(source).digest()
+        return self.base_digest, frozenset(self.writes.items())
@@ -0,0 +1,195 @@
+import atexit
+import os
+from bisect import bisect_right
+from collections import Counter
+
+from .computer import Computer
+
+JUMP_OPS = (5, 6)
+JUMP_SIZE = 3
+
+OP_NAMES = {
+    1: 'add',
+    2: 'mul',
+    3: 'in',
+    4: 'out',
+    5: 'jump-if-true',
+    6: 'jump-if-false',
+    7: 'less-than',
+    8: 'equals',
+    9: 'adjust-base',
+}
+
+REPORT_TOP = 10
+
+# Environment variable naming a file to write, when the process exits, the
+# report of every ProfiledComputer it ran, e.g. for a day script run with
+# INTCODE_ENGINE=profiled
+REPORT_PATH_VAR = 'INTCODE_PROFILE'
+
+# Profiles of the machines this process has made, while a report is due
+profiles = []
+
+
+class Profile:
+    """Counts gathered while a ProfiledComputer runs"""
+    def __init__(self):
+        self.steps = 0
+        # Executions per instruction pointer and per op
+        self.ip_counts = Counter()
+        self.op_counts = Counter()
+        # Per jump instruction, times it was and wasn't taken
+        self.taken = Counter()
+        self.not_taken = Counter()
+        # Times control went from one ptr to another by a jump
+        self.edges = Counter()
+        # Reads and writes per address, not counting op fetches or
+        # immediate params
+        self.reads = Counter()
+        self.writes = Counter()
+        # Where basic blocks start: the entry point and every jump's
+        # destination, taken or not
+        self.leaders = set()
+
+    # Add the counts of `other` to this profile's
+    def merge(self, other):
+        self.steps += other.steps
+        for name in ('ip_counts', 'op_counts', 'taken', 'not_taken', 'edges',
+                     'reads', 'writes'):
+            getattr(self, name).update(getattr(other, name))
+        self.leaders |= other.leaders
+
+    # Basic blocks by executions, as (leader, executions, ops executed)
+    def hot_blocks(self):
+        leaders = sorted(self.leaders)
+        ops = Counter()
+        for ptr, count in self.ip_counts.items():
+            ix = bisect_right(leaders, ptr) - 1
+            if ix >= 0:
+                ops[leaders[ix]] += count
+        blocks = [
+            (leader, self.ip_counts[leader], ops[leader]) for leader in leaders
+        ]
+        return sorted(blocks, key=lambda block: block[2], reverse=True)
+
+    # Backward jumps by times taken, as (from, to, iterations)
+    def loops(self):
+        back_edges = [
+            (src, dest, count) for (src, dest), count in self.edges.items()
+            if dest <= src
+        ]
+        return sorted(back_edges, key=lambda edge: edge[2], reverse=True)
+
+    def report(self, top=REPORT_TOP):
+        steps = max(self.steps, 1)
+        lines = ['Steps: {}'.format(self.steps), '', 'Ops:']
+        for op_val, count in self.op_counts.most_common():
+            lines.append('  {:<14} {:>10} {:>6.1%}'.format(
+                OP_NAMES.get(op_val, op_val), count, count / steps
+            ))
+
+        lines += ['', 'Hot blocks (leader, entries, ops, share):']
+        for leader, entries, ops in self.hot_blocks()[:top]:
+            lines.append('  {:>6} {:>10} {:>10} {:>6.1%}'.format(
+                leader, entries, ops, ops / steps
+            ))
+
+        lines += ['', 'Loops (jump, back to, iterations):']
+        for src, dest, count in self.loops()[:top]:
+            lines.append('  {:>6} {:>6} {:>10}'.format(src, dest, count))
+
+        lines += ['', 'Jumps (ptr, taken, not taken):']
+        jumps = self.taken + self.not_taken
+        for ptr, _ in jumps.most_common(top):
+            lines.append('  {:>6} {:>10} {:>10}'.format(
+                ptr, self.taken[ptr], self.not_taken[ptr]
+            ))
+
+        lines += ['', 'Memory heat (address, reads, writes):']
+        heat = self.reads + self.writes
+        for address, _ in heat.most_common(top):
+            lines.append('  {:>6} {:>10} {:>10}'.format(
+                address, self.reads[address], self.writes[address]
+            ))
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, top=REPORT_TOP):
+        with open(path, 'w') as f:
+            f.write(self.report(top))
+
+
+class ProfiledComputer(Computer):
+    """Computer that records a Profile of everything it executes. It is a
+    separate engine, rather than a flag checked on every op, so that
+    machines that aren't being profiled pay nothing for it.
+    """
+    def __init__(self, tape, ptr, in_vals=None, base=0, verbose=False):
+        super().__init__(tape, ptr, in_vals, base, verbose=verbose)
+        self.profile = Profile()
+        self.profile.leaders.add(ptr)
+        if os.environ.get(REPORT_PATH_VAR):
+            if not profiles:
+                atexit.register(write_report)
+            profiles.append(self.profile)
+
+    # Address a param resolves to, or None for an immediate param
+    def resolve(self, mode, ix):
+        if mode == 0:
+            return self.direct_lookup(ix)
+        elif mode == 2:
+            return self.base + self.direct_lookup(ix)
+        return None
+
+    def getter(self, mode, ix):
+        address = self.resolve(mode, ix)
+        if address is not None:
+            self.profile.reads[address] += 1
+        return super().getter(mode, ix)
+
+    def setter(self, mode, ix, val):
+        address = self.resolve(mode, ix)
+        self.profile.writes[ix if address is None else address] += 1
+        return super().setter(mode, ix, val)
+
+    lookup = getter
+    assign = setter
+
+    # Every run loop dispatches through the ops dict, so recording is
+    # done by wrapping each op there
+    def build_ops(self):
+        return {
+            op_val: self.profiled(op_val, op)
+            for op_val, op in super().build_ops().items()
+        }
+
+    def profiled(self, op_val, op):
+        def run_op(*modes):
+            ptr = self.ptr
+            op(*modes)
+            self.record(op_val, ptr)
+        return run_op
+
+    # Count the op at `ptr`, which has just been run
+    def record(self, op_val, ptr):
+        profile = self.profile
+        profile.steps += 1
+        profile.ip_counts[ptr] += 1
+        profile.op_counts[op_val] += 1
+        if op_val in JUMP_OPS:
+            profile.leaders.add(self.ptr)
+            profile.leaders.add(ptr + JUMP_SIZE)
+            if self.ptr == ptr + JUMP_SIZE:
+                profile.not_taken[ptr] += 1
+            else:
+                profile.taken[ptr] += 1
+                profile.edges[(ptr, self.ptr)] += 1
+
+
+# Write the report of every profiled machine, merged, to the file named by
+# REPORT_PATH_VAR. Machines in worker processes aren't included, as pool
+# workers exit without running exit handlers
+def write_report():
+    merged = Profile()
+    for profile in profiles:
+        merged.merge(profile)
+    merged.write_report(os.environ[REPORT_PATH_VAR])
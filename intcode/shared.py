@@ -0,0 +1,71 @@
+import sys
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from .memory import ARRAY_TYPECODE, CowMemory
+
+
+class SharedProgram:
+    """A parsed program placed once in shared memory as packed 64-bit
+    cells, for machines in any number of processes to run on.
+
+    Pickling a SharedProgram sends only the segment's name, and unpickling
+    attaches to it, so handing one to every worker in a pool costs the
+    same however big the program is. Machines built with `memory()` read
+    the shared cells in place and keep their writes to themselves.
+    """
+    def __init__(self, program):
+        # Raises OverflowError for cells that don't fit in 64 bits
+        packed = array(ARRAY_TYPECODE, program)
+        size = max(len(packed), 1) * packed.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.shm.buf[:len(packed) * packed.itemsize] = packed.tobytes()
+        self.length = len(packed)
+        self.owner = True
+        self.cells = self.view()
+
+    # Read-only view of the cells, as ints
+    def view(self):
+        return self.shm.buf.cast(ARRAY_TYPECODE)[:self.length].toreadonly()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __len__(self):
+        return self.length
+
+    def __getstate__(self):
+        return {'name': self.name, 'length': self.length}
+
+    def __setstate__(self, state):
+        self.shm = attach(state['name'])
+        self.length = state['length']
+        self.owner = False
+        self.cells = self.view()
+
+    # A fresh machine's memory over the shared cells
+    def memory(self):
+        return CowMemory(self.cells)
+
+    # Every machine built on the cells must be gone before this
+    def close(self):
+        self.cells.release()
+        self.shm.close()
+
+    # Close, and remove the segment if this process created it
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Attach to an existing segment without the resource tracker claiming it:
+# before 3.13 it would unlink the segment when this process exits, even
+# though the creator still owns it
+def attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
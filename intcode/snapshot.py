@@ -0,0 +1,32 @@
+import pickle
+import zlib
+from collections import namedtuple
+from itertools import accumulate
+
+VERSION = 1
+
+# A machine's state. `delta` is memory as {address: value} for the cells
+# that differ from the program the machine was loaded with
+Snapshot = namedtuple('Snapshot', ['ptr', 'base', 'in_vals', 'out', 'delta'])
+
+
+def dumps(snapshot):
+    """Serialize a snapshot to compressed bytes"""
+    addresses = sorted(snapshot.delta)
+    values = [snapshot.delta[ix] for ix in addresses]
+    # Addresses as the gap from the one before, which are mostly small
+    gaps = [ix - prev for prev, ix in zip([0] + addresses, addresses)]
+    state = (
+        VERSION, snapshot.ptr, snapshot.base, list(snapshot.in_vals),
+        snapshot.out, gaps, values,
+    )
+    return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+
+def loads(data):
+    """Read a snapshot serialized by `dumps`"""
+    version, ptr, base, in_vals, out, gaps, values = pickle.loads(zlib.decompress(data))
+    if version != VERSION:
+        raise ValueError("Expected a version {} snapshot, got {}".format(VERSION, version))
+    delta = dict(zip(accumulate(gaps), values))
+    return Snapshot(ptr, base, tuple(in_vals), out, delta)
@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+from .computer import Computer, INPUT_OP
+from .icb import OP_SIZES
+
+TRACE_LENGTH = 10000
+CHECKPOINT_EVERY = 100000
+
+# One executed op: the raw opcode at `ptr`, the param cells as they were
+# before it ran, and the (address, value) pairs it wrote
+Step = namedtuple('Step', ['step', 'ptr', 'op_code', 'operands', 'writes'])
+
+# Machine state before step `step` ran
+Checkpoint = namedtuple('Checkpoint', ['step', 'ptr', 'base', 'out', 'memory'])
+
+
+class TracedComputer(Computer):
+    """Computer that keeps the last `trace_length` ops it ran in `trace`,
+    and enough besides to rebuild the machine as it was before any step:
+    a checkpoint of its state every `checkpoint_every` steps, and a log of
+    every input it read. `replay(step)` restarts from the checkpoint
+    nearest to `step` and reruns the ops from there, which takes at most
+    `checkpoint_every` steps however long the traced run was.
+    """
+    def __init__(self, tape, ptr, in_vals=None, base=0, verbose=False,
+                 trace_length=TRACE_LENGTH, checkpoint_every=CHECKPOINT_EVERY):
+        super().__init__(tape, ptr, in_vals, base, verbose=verbose)
+        self.trace = deque(maxlen=trace_length)
+        self.checkpoint_every = checkpoint_every
+        self.steps = 0
+        self.checkpoints = []
+        # (step, value) for every input read and output given
+        self.inputs = []
+        self.outputs = []
+        self.writes = []
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.checkpoints.append(Checkpoint(
+            self.steps, self.ptr, self.base, self.out, self.tape.clone()
+        ))
+
+    def direct_assign(self, ptr, val):
+        self.tape[ptr] = val
+        self.writes.append((ptr, val))
+
+    def address_assign(self, ptr, val):
+        self.direct_assign(self.tape[ptr], val)
+
+    # Every run loop dispatches through the ops dict, so tracing is done
+    # by wrapping each op there
+    def build_ops(self):
+        return {
+            op_val: self.traced(op_val, op)
+            for op_val, op in super().build_ops().items()
+        }
+
+    def traced(self, op_val, op):
+        size = OP_SIZES[op_val]
+
+        def run_op(*modes):
+            ptr = self.ptr
+            tape = self.tape
+            op_code = tape[ptr]
+            operands = tuple(tape[ix] for ix in range(ptr + 1, ptr + size))
+            self.writes = []
+            op(*modes)
+            self.record(Step(self.steps, ptr, op_code, operands, self.writes))
+        return run_op
+
+    def record(self, step):
+        self.trace.append(step)
+        if step.op_code % 100 == INPUT_OP:
+            self.inputs.append((step.step, step.writes[-1][1]))
+        elif step.op_code % 100 == 4:
+            self.outputs.append((step.step, self.out))
+
+        self.steps += 1
+        if self.steps % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def replay(self, step):
+        """A plain Computer in the state this one was in before `step`
+        ran, with the inputs it went on to read queued"""
+        if not 0 <= step <= self.steps:
+            raise ValueError("Step {} hasn't been run".format(step))
+
+        ix = bisect_right([checkpoint.step for checkpoint in self.checkpoints], step) - 1
+        checkpoint = self.checkpoints[ix]
+        computer = Computer(
+            tape=checkpoint.memory.clone(),
+            ptr=checkpoint.ptr,
+            in_vals=[val for at, val in self.inputs if at >= checkpoint.step],
+            base=checkpoint.base,
+        )
+        computer.out = checkpoint.out
+        for _ in range(step - checkpoint.step):
+            computer.perform_op()
+        return computer